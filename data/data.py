@@ -1,61 +1,127 @@
 import argparse
 import json
+import mmap
+import os
 import sys
+from functools import partial
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+
+    def _json_dumps(record: dict) -> bytes:
+        return orjson.dumps(record)
+
+except ImportError:  # pragma: no cover — stdlib fallback
+    _json_loads = json.loads
+
+    def _json_dumps(record: dict) -> bytes:
+        return json.dumps(record, ensure_ascii=False).encode("utf-8")
 
 
 def read_jsonl(file_path: Path) -> Iterable[dict]:
-    """Yield dicts from a JSONL file, skipping malformed lines gracefully."""
-    with file_path.open("r", encoding="utf-8") as fp:
-        for line_num, line in enumerate(fp, start=1):
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                yield json.loads(line)
-            except json.JSONDecodeError as err:
-                print(
-                    f"Warning: Skipping malformed JSON on line {line_num} in {file_path.name}: {err}"
-                )
+    """Yield dicts from a JSONL file, skipping malformed lines gracefully.
+
+    The file is memory-mapped and split with ``mmap.find`` (a memchr scan), so
+    each line reaches the parser as raw bytes with no str decode or strip.
+    """
+    with file_path.open("rb") as fp:
+        size = os.fstat(fp.fileno()).st_size
+        if size == 0:
+            return  # mmap cannot map an empty file
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = 0
+            line_num = 0
+            while start < size:
+                end = mm.find(b"\n", start)
+                if end == -1:
+                    end = size  # last line without a trailing newline
+                line = mm[start:end]
+                start = end + 1
+                line_num += 1
+                if not line or line.isspace():
+                    continue
+                try:
+                    yield _json_loads(line)
+                except json.JSONDecodeError as err:
+                    print(
+                        f"Warning: Skipping malformed JSON on line {line_num} in {file_path.name}: {err}"
+                    )
+
+
+class ProductMeta(NamedTuple):
+    """Join-ready projection of one metadata row, computed once per product."""
+
+    product_id: str
+    product_name: str
+    product_description: str
+    avg_rating: Any
+    rating_count: Any
+    category: str
+    store: str
+    price: Any
+
+
+def join_description(description_field: Any) -> str:
+    """Flatten a metadata description (usually a list of paragraphs) to one string."""
+    if isinstance(description_field, list):
+        return " ".join(map(str, description_field))
+    return str(description_field or "")
+
+
+def _intern(value: Any) -> Any:
+    """Intern str values so repeated ones share a single object."""
+    return sys.intern(value) if isinstance(value, str) else value
+
 
+def load_metadata(metadata_jsonl: Path) -> Dict[str, ProductMeta]:
+    """Load metadata keyed by parent_asin (or asin if parent is missing).
 
-def load_metadata(metadata_jsonl: Path) -> Dict[str, dict]:
-    """Load metadata keyed by parent_asin (or asin if parent is missing)."""
-    product_id_to_meta: Dict[str, dict] = {}
+    Each row is reduced to a ``ProductMeta`` here, so the description join and
+    field lookups run once per product rather than once per review. Category
+    and store names repeat across many products and are interned, so the
+    index holds one copy of each instead of one per product.
+    """
+    product_id_to_meta: Dict[str, ProductMeta] = {}
     for meta in read_jsonl(metadata_jsonl):
         asin: Optional[str] = meta.get("parent_asin") or meta.get("asin")
         if not asin:
             continue
-        product_id_to_meta[asin] = meta
+        product_id_to_meta[asin] = ProductMeta(
+            product_id=asin,
+            product_name=meta.get("title", ""),
+            product_description=join_description(meta.get("description", [])),
+            avg_rating=meta.get("average_rating", 0),
+            rating_count=meta.get("rating_number", 0),
+            category=_intern(meta.get("main_category", "")),
+            store=_intern(meta.get("store", "")),
+            price=meta.get("price"),
+        )
     print(
         f"Loaded metadata for {len(product_id_to_meta)} products from {metadata_jsonl}"
     )
     return product_id_to_meta
 
 
-def build_merged_record(review: dict, meta: dict) -> dict:
+def build_merged_record(review: dict, meta: ProductMeta) -> dict:
     """Project the merged review + metadata into the required schema."""
-    description_field = meta.get("description", [])
-    if isinstance(description_field, list):
-        product_description = " ".join([str(x) for x in description_field])
-    else:
-        product_description = str(description_field or "")
-
     return {
-        "product_id": review.get("asin") or meta.get("parent_asin") or meta.get("asin"),
-        "product_name": meta.get("title", ""),
-        "product_description": product_description,
+        "product_id": review.get("asin") or meta.product_id,
+        "product_name": meta.product_name,
+        "product_description": meta.product_description,
         "user_id": review.get("user_id", ""),
         "text": review.get("text", ""),
         "title": review.get("title", ""),
         "rating": review.get("rating", 0),
-        "avg_rating": meta.get("average_rating", 0),
-        "rating_count": meta.get("rating_number", 0),
+        "avg_rating": meta.avg_rating,
+        "rating_count": meta.rating_count,
         # Extras
-        "category": meta.get("main_category", ""),
-        "store": meta.get("store", ""),
-        "price": meta.get("price"),
+        "category": meta.category,
+        "store": meta.store,
+        "price": meta.price,
         "verified_purchase": review.get("verified_purchase", False),
         "helpful_vote": review.get("helpful_vote", 0),
         "timestamp": review.get("timestamp", 0),
@@ -66,25 +132,127 @@ from typing import Union, Optional, List
 from pathlib import Path
 
 
+def _price_json(value: Any) -> Optional[str]:
+    """JSON-encode a price so Parquet keeps exactly what the JSONL output has.
+
+    Metadata prices are mostly numbers but also strings such as "$10" or "None";
+    a float column would turn those into null.
+    """
+    if value is None:
+        return None
+    return _json_dumps(value).decode("utf-8")
+
+
+class _ParquetSink:
+    """Buffer merged records column-wise and write them as Snappy Parquet row groups.
+
+    Parquet is the trusted, typed hand-off to ingestion: it is read back with
+    C++ columnar decoding instead of re-parsing (and re-validating) JSON per row.
+    """
+
+    def __init__(self, path: Path, batch_size: int = 50_000):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._schema = pa.schema(
+            [
+                ("product_id", pa.string()),
+                ("product_name", pa.string()),
+                ("product_description", pa.string()),
+                ("user_id", pa.string()),
+                ("text", pa.string()),
+                ("title", pa.string()),
+                ("rating", pa.float64()),
+                ("avg_rating", pa.float64()),
+                ("rating_count", pa.int64()),
+                ("category", pa.string()),
+                ("store", pa.string()),
+                ("price", pa.string()),  # JSON-encoded, see _price_json
+                ("verified_purchase", pa.bool_()),
+                ("helpful_vote", pa.int64()),
+                ("timestamp", pa.int64()),
+            ]
+        )
+        self._writer = pq.ParquetWriter(path, self._schema, compression="snappy")
+        self._columns: Dict[str, list] = {name: [] for name in self._schema.names}
+        self._batch_size = batch_size
+        self._pending = 0
+
+    def add(self, record: dict) -> None:
+        for name, values in self._columns.items():
+            values.append(record[name])
+        self._pending += 1
+        if self._pending >= self._batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        self._columns["price"] = [_price_json(v) for v in self._columns["price"]]
+        self._writer.write_table(self._pa.Table.from_pydict(self._columns, schema=self._schema))
+        for values in self._columns.values():
+            values.clear()
+        self._pending = 0
+
+    def close(self) -> None:
+        self.flush()
+        self._writer.close()
+
+
+# Output files get a 4MB buffer and encoded records are handed over in batches
+# via writelines, instead of one buffered write() call per record
+_WRITE_BUFFER_SIZE = 4 * 1024 * 1024
+_WRITE_BATCH_SIZE = 4096
+
+
+def _drain(fp, pending: List[bytes]) -> None:
+    """Write and clear a batch of pending encoded lines."""
+    if fp and pending:
+        fp.writelines(pending)
+        pending.clear()
+
+
 def merge_reviews_with_metadata(
     reviews_jsonl: Union[Path, str],
     metadata_jsonl: Union[Path, str],
     output_json: Optional[Path],
     output_jsonl: Optional[Path],
     sample_limit: Optional[int] = None,
-) -> List[dict]:
+    output_parquet: Optional[Path] = None,
+) -> int:
+    """Join reviews with metadata in a single streaming pass.
+
+    Records are written to the JSONL and JSON outputs as they are produced and
+    never accumulated in memory. Reviews with neither a title nor text are
+    dropped here, since ingestion could not embed them anyway. Returns the
+    number of merged records. ``output_parquet`` additionally writes a
+    Parquet file (requires pyarrow).
+    """
     print("Loading metadata...")
     meta_index = load_metadata(metadata_jsonl)
     print(f"Loaded metadata for {len(meta_index)} products")
 
-    merged_records: List[dict] = []
     jsonl_fp = None
+    json_fp = None
+    parquet_sink = None
+    jsonl_pending: List[bytes] = []
+    json_pending: List[bytes] = []
     processed_count = 0
     skipped_count = 0
 
     try:
         if output_jsonl:
-            jsonl_fp = output_jsonl.open("w", encoding="utf-8")
+            jsonl_fp = output_jsonl.open("wb", buffering=_WRITE_BUFFER_SIZE)
+        if output_json:
+            # JSON array is streamed too: "[", records joined by ",\n", "]"
+            json_fp = output_json.open("wb", buffering=_WRITE_BUFFER_SIZE)
+            json_fp.write(b"[")
+        if output_parquet:
+            parquet_sink = _ParquetSink(output_parquet)
+
+        # Bound once: the loop body runs tens of millions of times
+        get_meta = meta_index.get
 
         print("Processing reviews...")
         for i, review in enumerate(read_jsonl(reviews_jsonl)):
@@ -93,41 +261,151 @@ def merge_reviews_with_metadata(
                     f"Processed {i} reviews, merged {processed_count}, skipped {skipped_count}"
                 )
 
-            asin = review.get("asin")
-            if not asin:
+            # One probe covers both misses: load_metadata never indexes an
+            # empty key, so a missing/empty asin also comes back as None
+            meta = get_meta(review.get("asin"))
+            if meta is None:
                 skipped_count += 1
                 continue
-            meta = meta_index.get(asin)
-            if not meta:
+            if not ((review.get("title") or "").strip() or (review.get("text") or "").strip()):
                 skipped_count += 1
                 continue
 
             record = build_merged_record(review, meta)
+            encoded = _json_dumps(record)
+            if parquet_sink:
+                parquet_sink.add(record)
 
-            # Stream to JSONL to avoid high memory usage
             if jsonl_fp:
-                jsonl_fp.write(json.dumps(record, ensure_ascii=False) + "\n")
+                jsonl_pending.append(encoded + b"\n")
+            if json_fp:
+                json_pending.append((b"\n" if processed_count == 0 else b",\n") + encoded)
 
-            merged_records.append(record)
             processed_count += 1
+            if processed_count % _WRITE_BATCH_SIZE == 0:
+                _drain(jsonl_fp, jsonl_pending)
+                _drain(json_fp, json_pending)
 
-            if sample_limit is not None and len(merged_records) >= sample_limit:
+            if sample_limit is not None and processed_count >= sample_limit:
                 print(f"Reached sample limit of {sample_limit}")
                 break
 
     finally:
         if jsonl_fp:
+            _drain(jsonl_fp, jsonl_pending)
             jsonl_fp.close()
+        if json_fp:
+            _drain(json_fp, json_pending)
+            json_fp.write(b"\n]\n")
+            json_fp.close()
+        if parquet_sink:
+            parquet_sink.close()
 
     print(f"Final counts: processed {processed_count}, skipped {skipped_count}")
 
-    # Write JSON array if requested
-    if output_json:
-        print(f"Writing JSON file to {output_json}")
-        with output_json.open("w", encoding="utf-8") as f:
-            json.dump(merged_records, f, indent=2, ensure_ascii=False)
+    return processed_count
+
+
+def _sql_literal(value: Union[Path, str]) -> str:
+    """Quote a path as a SQL string literal for DuckDB."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+# Same projection as build_merged_record, expressed in DuckDB SQL. Inputs are
+# read with explicit column types so only the needed fields are parsed and
+# no schema inference pass runs over the (large) JSONL files. Like the Python
+# path, explicit nulls stay null: the Amazon files always carry these keys,
+# so the Python .get() defaults never apply. Only the description defaults
+# to '', matching join_description(None).
+_DUCKDB_MERGE_SQL = """
+WITH meta AS (
+    SELECT DISTINCT ON (product_key) COALESCE(parent_asin, asin) AS product_key, *
+    FROM read_json(
+        {metadata}, format = 'newline_delimited', ignore_errors = true,
+        columns = {{
+            parent_asin: 'VARCHAR', asin: 'VARCHAR', title: 'VARCHAR',
+            description: 'JSON', average_rating: 'DOUBLE', rating_number: 'BIGINT',
+            main_category: 'VARCHAR', store: 'VARCHAR', price: 'JSON'
+        }}
+    )
+    WHERE COALESCE(parent_asin, asin) IS NOT NULL
+)
+SELECT
+    r.asin AS product_id,
+    m.title AS product_name,
+    CASE
+        WHEN json_type(m.description) = 'ARRAY'
+            THEN array_to_string(CAST(m.description AS VARCHAR[]), ' ')
+        ELSE COALESCE(m.description ->> '$', '')
+    END AS product_description,
+    r.user_id AS user_id,
+    r.text AS text,
+    r.title AS title,
+    r.rating AS rating,
+    m.average_rating AS avg_rating,
+    m.rating_number AS rating_count,
+    m.main_category AS category,
+    m.store AS store,
+    m.price AS price,
+    r.verified_purchase AS verified_purchase,
+    r.helpful_vote AS helpful_vote,
+    r.timestamp AS timestamp
+FROM read_json(
+    {reviews}, format = 'newline_delimited', ignore_errors = true,
+    columns = {{
+        asin: 'VARCHAR', user_id: 'VARCHAR', text: 'VARCHAR', title: 'VARCHAR',
+        rating: 'DOUBLE', verified_purchase: 'BOOLEAN', helpful_vote: 'BIGINT',
+        timestamp: 'BIGINT'
+    }}
+) AS r
+JOIN meta AS m ON r.asin = m.product_key
+WHERE trim(COALESCE(r.title, '')) <> '' OR trim(COALESCE(r.text, '')) <> ''
+{limit}
+"""
+
+
+def merge_reviews_with_metadata_duckdb(
+    reviews_jsonl: Union[Path, str],
+    metadata_jsonl: Union[Path, str],
+    output_json: Optional[Path],
+    output_jsonl: Optional[Path],
+    sample_limit: Optional[int] = None,
+) -> int:
+    """Run the review/metadata join inside DuckDB instead of a Python loop.
+
+    DuckDB streams both JSONL files, performs a vectorized hash join and
+    writes the outputs itself. Requires the optional ``duckdb`` package.
+    Returns the number of merged records.
+    """
+    import duckdb
+
+    query = _DUCKDB_MERGE_SQL.format(
+        reviews=_sql_literal(reviews_jsonl),
+        metadata=_sql_literal(metadata_jsonl),
+        limit=f"LIMIT {int(sample_limit)}" if sample_limit is not None else "",
+    )
 
-    return merged_records
+    merged_count = 0
+    with duckdb.connect() as con:
+        if output_jsonl:
+            print(f"Writing JSONL file to {output_jsonl} (duckdb)")
+            (merged_count,) = con.execute(
+                f"COPY ({query}) TO {_sql_literal(output_jsonl)} (FORMAT JSON)"
+            ).fetchone()
+            # Reuse the JSONL output so both files hold exactly the same rows
+            query = (
+                f"SELECT * FROM read_json({_sql_literal(output_jsonl)}, "
+                "format = 'newline_delimited')"
+            )
+        if output_json:
+            print(f"Writing JSON file to {output_json} (duckdb)")
+            (merged_count,) = con.execute(
+                f"COPY ({query}) TO {_sql_literal(output_json)} (FORMAT JSON, ARRAY true)"
+            ).fetchone()
+
+    print(f"Final counts: processed {merged_count}")
+
+    return merged_count
 
 
 def parse_args() -> argparse.Namespace:
@@ -154,12 +432,25 @@ def parse_args() -> argparse.Namespace:
         default=str(Path("data") / "merged_electronics_data.jsonl"),
         help="Output JSONL file (one object per line)",
     )
+    parser.add_argument(
+        "--out_parquet",
+        default=None,
+        help="Optional Parquet output (Snappy) for faster ingestion; requires pyarrow",
+    )
     parser.add_argument(
         "--limit",
         type=int,
         default=None,
         help="Optional limit of merged records for sampling",
     )
+    parser.add_argument(
+        "--engine",
+        choices=["python", "duckdb"],
+        default="python",
+        help=(
+            "Join engine: streaming Python loop, or DuckDB (requires duckdb)"
+        ),
+    )
     return parser.parse_args()
 
 
@@ -170,13 +461,20 @@ def main() -> None:
     metadata_path = Path(args.metadata)
     out_json_path = Path(args.out_json) if args.out_json else None
     out_jsonl_path = Path(args.out_jsonl) if args.out_jsonl else None
+    out_parquet_path = Path(args.out_parquet) if args.out_parquet else None
 
     # Ensure output directory exists
-    for out in [out_json_path, out_jsonl_path]:
+    for out in [out_json_path, out_jsonl_path, out_parquet_path]:
         if out is not None:
             out.parent.mkdir(parents=True, exist_ok=True)
 
-    merged = merge_reviews_with_metadata(
+    if args.engine == "duckdb":
+        if out_parquet_path:
+            raise ValueError("--out_parquet is not supported with --engine duckdb")
+        merge = merge_reviews_with_metadata_duckdb
+    else:
+        merge = partial(merge_reviews_with_metadata, output_parquet=out_parquet_path)
+    merged_count = merge(
         reviews_jsonl=reviews_path,
         metadata_jsonl=metadata_path,
         output_json=out_json_path,
@@ -185,9 +483,10 @@ def main() -> None:
     )
 
     print(
-        f"Merged {len(merged)} records. "
+        f"Merged {merged_count} records. "
         f"JSON: {out_json_path if out_json_path else 'skipped'}, "
-        f"JSONL: {out_jsonl_path if out_jsonl_path else 'skipped'}"
+        f"JSONL: {out_jsonl_path if out_jsonl_path else 'skipped'}, "
+        f"Parquet: {out_parquet_path if out_parquet_path else 'skipped'}"
     )
 
 
@@ -4,24 +4,67 @@ Data Ingestion Pipeline — Stream-read JSONL, deduplicate, chunk, embed, insert
 Processes in incremental mega-batches (embed + insert) so progress is saved continuously.
 Supports resuming — skips products already in Supabase.
 """
+import asyncio
+import ctypes
+import gc
+import heapq
+import itertools
 import json
 import logging
+import multiprocessing
 import os
+import random
 import re
+import sys
 import time
 from collections import defaultdict
-from typing import Dict, List, Set
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+except ImportError:  # pragma: no cover — stdlib fallback
+    _json_loads = json.loads
 
 import tiktoken
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
 from supabase import create_client
-from tqdm import tqdm
+from tqdm.asyncio import tqdm_asyncio
 
 from config.config_loader import load_config
 
 load_dotenv(override=True)
 
+_REQUIRED_ENV = frozenset({"SUPABASE_URL", "SUPABASE_SERVICE_ROLE_KEY", "OPENAI_API_KEY"})
+
+# Review fields copied into each chunk's metadata (when not null)
+_METADATA_KEYS = (
+    "product_name",
+    "rating",
+    "avg_rating",
+    "category",
+    "store",
+    "price",
+    "verified_purchase",
+)
+
+# glibc's malloc_trim, used to hand freed heap pages back to the OS between
+# mega-batches. Unavailable (None) on non-glibc platforms.
+try:
+    _malloc_trim = ctypes.CDLL("libc.so.6").malloc_trim
+except (OSError, AttributeError):
+    _malloc_trim = None
+
+
+def release_freed_memory() -> None:
+    """Return freed heap memory to the OS on glibc; a no-op elsewhere."""
+    if _malloc_trim is not None:
+        _malloc_trim(0)
+
+
 # ── Tokenizer for chunk size enforcement ──
 TOKENIZER = tiktoken.get_encoding("cl100k_base")
 
@@ -50,18 +93,43 @@ def split_by_sentences(text: str, max_tokens: int, overlap: int = 2) -> List[str
     return chunks if chunks else [text]
 
 
+# Deduplicated reviews shared with forked shard workers. The parent sets this
+# right before the pool forks, so no shard is pickled to a child. The parent
+# also gc.freeze()s first: otherwise each child's cyclic GC writes to every
+# tracked review dict and copies nearly all of the list's pages. Refcount
+# updates still copy the pages of the reviews in a child's own shard.
+_SHARED_REVIEWS: List[dict] = []
+
+
+def _ingest_shard(reviews: List[dict]) -> int:
+    """Worker entry point: chunk, embed and insert one shard with its own clients."""
+    pipeline = DataIngestion()
+    return pipeline.process_incremental(pipeline.iter_chunks(reviews))
+
+
+def _ingest_shared_shard(bounds: Tuple[int, int]) -> int:
+    """Forked worker entry point: ingest ``_SHARED_REVIEWS[start:stop]``."""
+    start, stop = bounds
+    return _ingest_shard(_SHARED_REVIEWS[start:stop])
+
+
 class DataIngestion:
     def __init__(self):
         logging.info("Initializing DataIngestion pipeline")
         self.config = load_config()
         self.ingestion_cfg = self.config.get("ingestion", {})
 
-        self.supabase = create_client(
-            os.environ["SUPABASE_URL"],
-            os.environ["SUPABASE_SERVICE_ROLE_KEY"],
-        )
+        missing = _REQUIRED_ENV - os.environ.keys()
+        if missing:
+            raise ValueError(f"Missing env vars: {sorted(missing)}. Set them in .env")
+        env = {k: os.environ[k] for k in _REQUIRED_ENV}
+
+        self.supabase = create_client(env["SUPABASE_URL"], env["SUPABASE_SERVICE_ROLE_KEY"])
 
-        self.openai = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
+        self.openai_api_key = env["OPENAI_API_KEY"]
+        # Seeded from os.urandom when constructed, i.e. separately in every
+        # worker process, so sharded workers never share a jitter sequence
+        self._rng = random.Random()
         self.embed_model = self.config["embedding_model"]["model"]
         self.table = self.config["supabase"]["table_name"]
 
@@ -108,8 +176,38 @@ class DataIngestion:
 
     # ── Phase 1: Stream-read and deduplicate ──
 
+    @staticmethod
+    def _iter_rows(path: str) -> Iterator[dict]:
+        """Yield review rows from a JSONL file, or from Parquet if the path ends in .parquet."""
+        if path.endswith(".parquet"):
+            import pyarrow.parquet as pq
+
+            # Columnar + Snappy, decoded in C++: no per-row JSON parsing
+            # except for price, which data.py stores JSON-encoded
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=2048):
+                for row in batch.to_pylist():
+                    price = row.get("price")
+                    if isinstance(price, str):
+                        row["price"] = _json_loads(price)
+                    yield row
+            return
+
+        # Binary mode: orjson parses bytes directly, no str decode per line
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    yield _json_loads(line)
+                except json.JSONDecodeError:
+                    continue
+
     def load_and_deduplicate(self, skip_doc_ids: Set[str] = None) -> List[dict]:
-        """Stream-read JSONL, group by product_id, keep top N reviews per product."""
+        """Stream-read JSONL (or Parquet), group by product_id, keep top N reviews per product.
+
+        Each product holds a bounded min-heap of its N most helpful reviews, so
+        memory grows with products × N rather than with the size of the file.
+        """
         jsonl_path = self._resolve_path(self.config["data"]["jsonl_path"])
         max_per_product = int(self.ingestion_cfg.get("max_reviews_per_product", 10))
         min_length = int(self.ingestion_cfg.get("min_review_length", 50))
@@ -124,45 +222,43 @@ class DataIngestion:
         if skip_doc_ids:
             logging.info(f"Resuming — skipping {len(skip_doc_ids):,} already-ingested products")
 
-        product_reviews: Dict[str, List[dict]] = defaultdict(list)
+        # Heap entries are (helpful_vote, -line_number, row): the least helpful
+        # (and, on ties, the latest) review sits at the root and is evicted first.
+        product_reviews: Dict[str, List[Tuple[int, int, dict]]] = defaultdict(list)
         total_read = 0
         skipped_short = 0
         skipped_helpful = 0
         skipped_existing = 0
 
-        with open(jsonl_path, "r", encoding="utf-8", errors="replace") as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    row = json.loads(line)
-                except json.JSONDecodeError:
-                    continue
-
-                total_read += 1
-                if total_read % 500_000 == 0:
-                    logging.info(f"  ...read {total_read:,} lines")
+        for row in self._iter_rows(jsonl_path):
+            total_read += 1
+            if total_read % 500_000 == 0:
+                logging.info(f"  ...read {total_read:,} lines")
 
-                product_id = row.get("product_id") or row.get("asin")
-                if not product_id:
-                    continue
+            product_id = row.get("product_id") or row.get("asin")
+            if not product_id:
+                continue
 
-                if product_id in skip_doc_ids:
-                    skipped_existing += 1
-                    continue
+            if product_id in skip_doc_ids:
+                skipped_existing += 1
+                continue
 
-                review_text = (row.get("text") or "").strip()
-                if len(review_text) < min_length:
-                    skipped_short += 1
-                    continue
+            review_text = (row.get("text") or "").strip()
+            if len(review_text) < min_length:
+                skipped_short += 1
+                continue
 
-                helpful = row.get("helpful_vote", 0) or 0
-                if helpful < min_helpful:
-                    skipped_helpful += 1
-                    continue
+            helpful = row.get("helpful_vote", 0) or 0
+            if helpful < min_helpful:
+                skipped_helpful += 1
+                continue
 
-                product_reviews[product_id].append(row)
+            heap = product_reviews[product_id]
+            entry = (helpful, -total_read, row)
+            if len(heap) < max_per_product:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
 
         logging.info(
             f"Read {total_read:,} total lines. "
@@ -172,25 +268,29 @@ class DataIngestion:
         )
 
         deduplicated = []
-        for product_id, reviews in product_reviews.items():
-            reviews.sort(key=lambda r: r.get("helpful_vote", 0) or 0, reverse=True)
-            deduplicated.extend(reviews[:max_per_product])
+        for heap in product_reviews.values():
+            heap.sort(reverse=True)
+            deduplicated.extend(row for _, _, row in heap)
+        product_count = len(product_reviews)
+        del product_reviews
 
         logging.info(
             f"After dedup: {len(deduplicated):,} reviews "
-            f"(from {len(product_reviews):,} products)"
+            f"(from {product_count:,} products)"
         )
         return deduplicated
 
     # ── Phase 2: Transform reviews into chunks ──
 
-    def transform(self, reviews: List[dict]) -> List[dict]:
-        """Convert reviews into chunks ready for embedding."""
+    def iter_chunks(self, reviews: Iterable[dict]) -> Iterator[dict]:
+        """Lazily convert reviews into chunks ready for embedding."""
         max_tokens = int(self.ingestion_cfg.get("max_tokens", 1300))
         min_tokens = int(self.ingestion_cfg.get("min_tokens", 50))
 
-        chunks = []
+        review_count = 0
+        chunk_count = 0
         for row in reviews:
+            review_count += 1
             title = (row.get("title") or "").strip()
             review_text = (row.get("text") or "").strip()
             content = f"{title}\n\n{review_text}".strip() if title else review_text
@@ -199,19 +299,7 @@ class DataIngestion:
                 continue
 
             product_id = row.get("product_id") or row.get("asin") or ""
-            metadata = {
-                k: v
-                for k, v in {
-                    "product_name": row.get("product_name"),
-                    "rating": row.get("rating"),
-                    "avg_rating": row.get("avg_rating"),
-                    "category": row.get("category"),
-                    "store": row.get("store"),
-                    "price": row.get("price"),
-                    "verified_purchase": row.get("verified_purchase"),
-                }.items()
-                if v is not None
-            }
+            metadata = {k: row[k] for k in _METADATA_KEYS if row.get(k) is not None}
 
             if count_tokens(content) > max_tokens:
                 text_chunks = split_by_sentences(content, max_tokens)
@@ -221,35 +309,45 @@ class DataIngestion:
             for idx, chunk_text in enumerate(text_chunks):
                 if count_tokens(chunk_text) < min_tokens:
                     continue
-                chunks.append({
+                chunk_count += 1
+                yield {
                     "doc_id": product_id,
                     "chunk_index": idx,
                     "content": chunk_text,
                     "metadata": metadata,
-                })
+                }
 
-        logging.info(f"Transform complete: {len(chunks):,} chunks from {len(reviews):,} reviews")
-        return chunks
+        logging.info(f"Transform complete: {chunk_count:,} chunks from {review_count:,} reviews")
 
     # ── Helpers: embed and insert with retries ──
 
-    def _embed_batch(self, texts: List[str]) -> List[list]:
+    def _with_jitter(self, wait: float) -> float:
+        """Add up to 20% random jitter so concurrent retries don't fire in lockstep."""
+        return wait + self._rng.uniform(0, wait * 0.2)
+
+    async def _embed_batch(
+        self, openai: AsyncOpenAI, texts: List[str], sem: asyncio.Semaphore
+    ) -> List[list]:
         """Embed a list of texts with retry + rate limit handling."""
-        attempt = 0
-        while True:
-            try:
-                resp = self.openai.embeddings.create(model=self.embed_model, input=texts)
-                return [d.embedding for d in resp.data]
-            except Exception as exc:
-                attempt += 1
-                if attempt > 10:
-                    raise
-                if "429" in str(exc) or "rate" in str(exc).lower():
-                    wait = min(30 * attempt, 120)
-                else:
-                    wait = min(2**attempt, 30)
-                logging.warning(f"Embed failed (attempt {attempt}): {exc}. Retrying in {wait}s")
-                time.sleep(wait)
+        async with sem:
+            attempt = 0
+            while True:
+                try:
+                    resp = await openai.embeddings.create(model=self.embed_model, input=texts)
+                    return [d.embedding for d in resp.data]
+                except Exception as exc:
+                    attempt += 1
+                    if attempt > 10:
+                        raise
+                    if "429" in str(exc) or "rate" in str(exc).lower():
+                        wait = min(30 * attempt, 120)
+                    else:
+                        wait = min(2**attempt, 30)
+                    wait = self._with_jitter(wait)
+                    logging.warning(
+                        f"Embed failed (attempt {attempt}): {exc}. Retrying in {wait:.1f}s"
+                    )
+                    await asyncio.sleep(wait)
 
     def _insert_batch(self, rows: List[dict]):
         """Insert rows into Supabase with retry."""
@@ -262,76 +360,128 @@ class DataIngestion:
                 attempt += 1
                 if attempt > 5:
                     raise
-                wait = min(2**attempt, 30)
-                logging.warning(f"Insert failed (attempt {attempt}): {exc}. Retrying in {wait}s")
+                wait = self._with_jitter(min(2**attempt, 30))
+                logging.warning(f"Insert failed (attempt {attempt}): {exc}. Retrying in {wait:.1f}s")
                 time.sleep(wait)
 
+    async def _embed_chunks(
+        self, openai: AsyncOpenAI, chunks: List[dict], sem: asyncio.Semaphore
+    ):
+        """Embed a slice of chunks and store each vector on its chunk."""
+        embeddings = await self._embed_batch(openai, [c["content"] for c in chunks], sem)
+        for chunk, embedding in zip(chunks, embeddings):
+            chunk["embedding"] = embedding
+
+    async def _insert_batch_async(self, rows: List[dict], sem: asyncio.Semaphore):
+        """Run the blocking Supabase insert in a worker thread, bounded by ``sem``."""
+        async with sem:
+            await asyncio.to_thread(self._insert_batch, rows)
+
     # ── Phase 3+4: Embed and insert in mega-batches ──
 
-    def process_incremental(self, chunks: List[dict], mega_batch_size: int = 2000):
-        """Embed + insert in mega-batches of 2000. Progress saved after each batch."""
+    def process_incremental(self, chunks: Iterable[dict], mega_batch_size: int = 2000) -> int:
+        """Embed + insert in mega-batches of 2000. Progress saved after each batch.
+
+        ``chunks`` is consumed lazily, so only one mega-batch is held in memory.
+        Within a mega-batch, up to ``ingestion.concurrency`` embed and insert
+        requests are in flight at once. Returns the number of chunks inserted.
+        """
+        return asyncio.run(self._process_incremental_async(chunks, mega_batch_size))
+
+    async def _process_incremental_async(
+        self, chunks: Iterable[dict], mega_batch_size: int
+    ) -> int:
         embed_batch_size = int(self.ingestion_cfg.get("batch_embed", 100))
         insert_batch_size = int(self.ingestion_cfg.get("batch_insert", 200))
-        total = len(chunks)
+        concurrency = int(self.ingestion_cfg.get("concurrency", 8))
+        sem = asyncio.Semaphore(concurrency)
         total_inserted = 0
 
         logging.info(
-            f"Processing {total:,} chunks in mega-batches of {mega_batch_size}"
+            f"Processing chunks in mega-batches of {mega_batch_size} "
+            f"(concurrency={concurrency})"
         )
 
-        for mega_start in range(0, total, mega_batch_size):
-            mega_end = min(mega_start + mega_batch_size, total)
-            mega_batch = chunks[mega_start:mega_end]
-            mega_num = (mega_start // mega_batch_size) + 1
-            total_megas = (total + mega_batch_size - 1) // mega_batch_size
-
-            logging.info(
-                f"-- Mega-batch {mega_num}/{total_megas} "
-                f"({len(mega_batch):,} chunks) --"
-            )
-
-            # Step A: Embed this mega-batch
-            texts = [c["content"] for c in mega_batch]
-            all_embeddings = []
-            for i in tqdm(
-                range(0, len(texts), embed_batch_size),
-                desc=f"Embed [{mega_num}/{total_megas}]",
-                leave=False,
-            ):
-                batch = texts[i : i + embed_batch_size]
-                embeddings = self._embed_batch(batch)
-                all_embeddings.extend(embeddings)
-                time.sleep(1)
-
-            for i, chunk in enumerate(mega_batch):
-                chunk["embedding"] = all_embeddings[i]
-
-            # Step B: Insert this mega-batch into Supabase
-            rows = [
-                {
-                    "doc_id": c["doc_id"],
-                    "chunk_index": c["chunk_index"],
-                    "content": c["content"],
-                    "metadata": c["metadata"],
-                    "embedding": c["embedding"],
-                }
-                for c in mega_batch
-            ]
-            for i in range(0, len(rows), insert_batch_size):
-                self._insert_batch(rows[i : i + insert_batch_size])
+        chunk_iter = iter(chunks)
+        async with AsyncOpenAI(api_key=self.openai_api_key) as openai:
+            for mega_num in itertools.count(1):
+                mega_batch = list(itertools.islice(chunk_iter, mega_batch_size))
+                if not mega_batch:
+                    break
+
+                logging.info(f"-- Mega-batch {mega_num} ({len(mega_batch):,} chunks) --")
+
+                # Step A: Embed this mega-batch. Each task writes its vectors
+                # straight into its own slice of chunks, which already have the
+                # table's row shape, so no flattened embedding list is built.
+                await tqdm_asyncio.gather(
+                    *(
+                        self._embed_chunks(openai, mega_batch[i : i + embed_batch_size], sem)
+                        for i in range(0, len(mega_batch), embed_batch_size)
+                    ),
+                    desc=f"Embed [{mega_num}]",
+                    leave=False,
+                )
 
-            total_inserted += len(mega_batch)
+                # Step B: Insert this mega-batch into Supabase
+                await asyncio.gather(
+                    *(
+                        self._insert_batch_async(mega_batch[i : i + insert_batch_size], sem)
+                        for i in range(0, len(mega_batch), insert_batch_size)
+                    )
+                )
 
-            # Free memory
-            for c in mega_batch:
-                c.pop("embedding", None)
+                total_inserted += len(mega_batch)
+                del mega_batch
+                release_freed_memory()
 
-            logging.info(
-                f"Mega-batch {mega_num}/{total_megas} saved — "
-                f"{total_inserted:,}/{total:,} total ({100 * total_inserted / total:.1f}%)"
-            )
+                logging.info(f"Mega-batch {mega_num} saved — {total_inserted:,} total")
 
         logging.info(f"All done: {total_inserted:,} chunks embedded and inserted")
+        return total_inserted
+
+    def process_sharded(self, reviews: List[dict], workers: int) -> int:
+        """Split reviews into contiguous shards and ingest each in its own process.
+
+        Every worker builds its own OpenAI and Supabase clients, so throughput
+        scales with processes instead of being capped by one event loop.
+        On Linux the workers are forked and read the reviews from the parent's
+        memory rather than having them pickled to each. Elsewhere (e.g. macOS, where
+        forking after the SDK clients are initialized is unsafe) the default
+        start method is used and each worker receives its shard slice.
+        """
+        global _SHARED_REVIEWS
+
+        shard_size = -(-len(reviews) // workers)  # ceil division
+        bounds = [
+            (start, min(start + shard_size, len(reviews)))
+            for start in range(0, len(reviews), shard_size)
+        ]
+        logging.info(
+            f"Sharding {len(reviews):,} reviews across {len(bounds)} workers "
+            f"(~{shard_size:,} reviews each)"
+        )
+
+        if sys.platform.startswith("linux"):
+            _SHARED_REVIEWS = reviews
+            # Move everything into the permanent generation so the children's
+            # GC never writes to (and copies) the shared review objects
+            gc.freeze()
+            try:
+                with ProcessPoolExecutor(
+                    max_workers=len(bounds), mp_context=multiprocessing.get_context("fork")
+                ) as pool:
+                    total_inserted = sum(pool.map(_ingest_shared_shard, bounds))
+            finally:
+                gc.unfreeze()
+                _SHARED_REVIEWS = []
+        else:
+            shards = [reviews[start:stop] for start, stop in bounds]
+            with ProcessPoolExecutor(max_workers=len(bounds)) as pool:
+                total_inserted = sum(pool.map(_ingest_shard, shards))
+
+        logging.info(f"All workers done: {total_inserted:,} chunks embedded and inserted")
+        return total_inserted
 
     # ── Full pipeline ──
 
@@ -348,8 +498,11 @@ class DataIngestion:
             logging.info("No new reviews to ingest. Pipeline complete.")
             return
 
-        chunks = self.transform(reviews)
-        self.process_incremental(chunks)
+        workers = int(self.ingestion_cfg.get("workers", 1))
+        if workers > 1:
+            self.process_sharded(reviews, workers)
+        else:
+            self.process_incremental(self.iter_chunks(reviews))
 
         logging.info("=" * 60)
         logging.info("PIPELINE COMPLETE")
@@ -28,7 +28,7 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(
 @pytest.fixture(scope="session")
 def rag_pipeline():
     """Build the real RAG pipeline (requires API keys)."""
-    retriever = Retriever()
+    retriever = Retriever.get()
     model_loader = ModelLoader()
     graph = build_graph(retriever, model_loader, max_retries=2)
     llm = model_loader.load_llm()
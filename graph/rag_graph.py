@@ -10,12 +10,15 @@ from typing import List, TypedDict
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.documents import Document
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import END, StateGraph
 
 from prompts.prompt import PROMPT_TEMPLATES
 from retriever.retrieval import Retriever
 from utils.model_loader import ModelLoader
 
+logger = logging.getLogger(__name__)
+
 
 # ── State definition ──
 
@@ -32,13 +35,7 @@ class RAGState(TypedDict):
 
 # ── Node functions ──
 
-def retrieve(state: RAGState) -> dict:
-    """Retrieve documents from Supabase vector store."""
-    query = state.get("rewritten_query") or state["question"]
-    logging.info(f"[retrieve] query: {query[:80]}")
-
-    results = _retriever_instance.retrieve(query)
-
+def _retrieval_update(results) -> dict:
     documents = []
     sources = []
     for doc, score in results:
@@ -49,31 +46,42 @@ def retrieve(state: RAGState) -> dict:
             "similarity": round(float(score), 3),
         })
 
-    logging.info(f"[retrieve] found {len(documents)} documents")
+    logger.info("[retrieve] found %d documents", len(documents))
     return {"documents": documents, "sources": sources}
 
 
+def retrieve(state: RAGState) -> dict:
+    """Retrieve documents from Supabase vector store."""
+    query = state.get("rewritten_query") or state["question"]
+    logger.info("[retrieve] query: %.80s", query)
+    return _retrieval_update(_retriever_instance.retrieve(query))
+
+
+async def aretrieve(state: RAGState) -> dict:
+    """Async variant of retrieve, used when the graph runs via ainvoke."""
+    query = state.get("rewritten_query") or state["question"]
+    logger.info("[retrieve] query: %.80s", query)
+    return _retrieval_update(await _retriever_instance.aretrieve(query))
+
+
 def grade_docs(state: RAGState) -> dict:
     """Grade whether retrieved documents are relevant to the question."""
     docs = state.get("documents", [])
     if not docs:
-        logging.info("[grade_docs] no documents → irrelevant")
+        logger.info("[grade_docs] no documents → irrelevant")
         return {"grade": "irrelevant"}
 
     docs_text = "\n\n".join(
         f"[{i+1}] {doc.page_content[:300]}" for i, doc in enumerate(docs[:5])
     )
 
-    prompt = ChatPromptTemplate.from_template(PROMPT_TEMPLATES["grade"])
-    chain = prompt | _llm_instance | StrOutputParser()
-
-    result = chain.invoke({
+    result = _grade_chain.invoke({
         "question": state["question"],
         "documents": docs_text,
     })
 
     grade = "relevant" if "relevant" in result.lower() and "irrelevant" not in result.lower() else "irrelevant"
-    logging.info(f"[grade_docs] grade={grade} (raw: {result.strip()!r})")
+    logger.info("[grade_docs] grade=%s (raw: %r)", grade, result.strip())
     return {"grade": grade}
 
 
@@ -90,16 +98,13 @@ def generate(state: RAGState) -> dict:
     """Generate answer using retrieved context with citations."""
     context = _build_context(state.get("documents", []))
 
-    prompt = ChatPromptTemplate.from_template(PROMPT_TEMPLATES["generate"])
-    chain = prompt | _llm_instance | StrOutputParser()
-
-    answer = chain.invoke({
+    answer = _generate_chain.invoke({
         "context": context,
         "question": state["question"],
         "chat_history": state.get("chat_history", "No previous conversation."),
     })
 
-    logging.info(f"[generate] answer length: {len(answer)} chars")
+    logger.info("[generate] answer length: %d chars", len(answer))
     return {"answer": answer}
 
 
@@ -107,10 +112,7 @@ def generate_stream(state: RAGState):
     """Stream the generate step token by token."""
     context = _build_context(state.get("documents", []))
 
-    prompt = ChatPromptTemplate.from_template(PROMPT_TEMPLATES["generate"])
-    chain = prompt | _llm_instance | StrOutputParser()
-
-    for chunk in chain.stream({
+    for chunk in _generate_chain.stream({
         "context": context,
         "question": state["question"],
         "chat_history": state.get("chat_history", "No previous conversation."),
@@ -120,13 +122,10 @@ def generate_stream(state: RAGState):
 
 def rewrite(state: RAGState) -> dict:
     """Rewrite the query for better retrieval."""
-    prompt = ChatPromptTemplate.from_template(PROMPT_TEMPLATES["rewrite"])
-    chain = prompt | _llm_instance | StrOutputParser()
-
-    rewritten = chain.invoke({"question": state["question"]})
+    rewritten = _rewrite_chain.invoke({"question": state["question"]})
     retries = state.get("retries", 0) + 1
 
-    logging.info(f"[rewrite] retry={retries}, rewritten: {rewritten.strip()!r}")
+    logger.info("[rewrite] retry=%d, rewritten: %r", retries, rewritten.strip())
     return {"rewritten_query": rewritten.strip(), "retries": retries}
 
 
@@ -138,31 +137,46 @@ def route_after_grading(state: RAGState) -> str:
     if state.get("grade") == "relevant":
         return "generate"
     if state.get("retries", 0) >= max_retries:
-        logging.info("[route] max retries reached → generating with available docs")
+        logger.info("[route] max retries reached → generating with available docs")
         return "generate"
     return "rewrite"
 
 
 # ── Graph builder ──
 
+# Prompt templates are parsed once at import time
+_PROMPTS = {
+    name: ChatPromptTemplate.from_template(PROMPT_TEMPLATES[name])
+    for name in ("grade", "generate", "rewrite")
+}
+
 # Module-level singletons (initialized once by build_graph)
 _retriever_instance: Retriever = None  # type: ignore
 _llm_instance = None
+_grade_chain = None
+_generate_chain = None
+_rewrite_chain = None
 _max_retries: int = 2
 
 
 def build_graph(retriever: Retriever, model_loader: ModelLoader, max_retries: int = 2):
     """Build and compile the LangGraph RAG pipeline."""
     global _retriever_instance, _llm_instance, _max_retries
+    global _grade_chain, _generate_chain, _rewrite_chain
 
     _retriever_instance = retriever
     _llm_instance = model_loader.load_llm()
     _max_retries = max_retries
 
+    # Assemble the LLM chains once instead of on every node call
+    _grade_chain = _PROMPTS["grade"] | _llm_instance | StrOutputParser()
+    _generate_chain = _PROMPTS["generate"] | _llm_instance | StrOutputParser()
+    _rewrite_chain = _PROMPTS["rewrite"] | _llm_instance | StrOutputParser()
+
     workflow = StateGraph(RAGState)
 
     # Add nodes
-    workflow.add_node("retrieve", retrieve)
+    workflow.add_node("retrieve", RunnableLambda(retrieve, afunc=aretrieve))
     workflow.add_node("grade_docs", grade_docs)
     workflow.add_node("generate", generate)
     workflow.add_node("rewrite", rewrite)
@@ -184,9 +198,9 @@ def build_graph(retriever: Retriever, model_loader: ModelLoader, max_retries: in
     workflow.add_edge("generate", END)
 
     graph = workflow.compile()
-    logging.info(
-        f"RAG graph compiled: retrieve → grade_docs → generate/rewrite "
-        f"(max_retries={max_retries})"
+    logger.info(
+        "RAG graph compiled: retrieve → grade_docs → generate/rewrite (max_retries=%d)",
+        max_retries,
     )
     return graph
 
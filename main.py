@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import os
 from contextlib import asynccontextmanager
@@ -22,7 +23,13 @@ from utils.model_loader import ModelLoader
 load_dotenv(override=True)
 
 # ── Rate limiter ──
-limiter = Limiter(key_func=get_remote_address)
+# Counts live in process memory by default, so each worker enforces its own
+# limit. Point RATE_LIMIT_STORAGE_URI at shared storage (e.g. redis://...) to
+# enforce it across workers.
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=os.environ.get("RATE_LIMIT_STORAGE_URI", "memory://"),
+)
 
 # ── API key auth ──
 _API_KEY = os.environ.get("API_KEY", "")
@@ -45,10 +52,15 @@ async def lifespan(app: FastAPI):
     """Build the LangGraph pipeline once at startup."""
     global rag_graph
     logging.info("Building RAG graph...")
-    retriever = Retriever()
+    retriever = Retriever.get()
     model_loader = ModelLoader()
     max_retries = config.get("graph", {}).get("max_retries", 2)
     rag_graph = build_graph(retriever, model_loader, max_retries=max_retries)
+    if config.get("retriever", {}).get("warmup", True):
+        try:
+            await asyncio.to_thread(retriever.warmup)
+        except Exception as e:
+            logging.warning(f"Retriever warmup failed (first request will connect): {e}")
     logging.info("RAG graph ready")
     yield
     logging.info("Shutting down")
@@ -106,7 +118,8 @@ async def chat(request: Request, msg: str = Form(...), chat_history: str = Form(
         )
 
     try:
-        result = rag_graph.invoke({
+        # Async invoke keeps the event loop free while the graph waits on I/O
+        result = await rag_graph.ainvoke({
             "question": query,
             "rewritten_query": "",
             "documents": [],
@@ -185,5 +198,17 @@ if __name__ == "__main__":
     if os.environ.get("LANGCHAIN_TRACING_V2", "").lower() == "true":
         logging.info("LangSmith tracing enabled (project: %s)", os.environ.get("LANGCHAIN_PROJECT", "default"))
     port = int(os.environ.get("PORT", 8001))
-    logging.info("Starting API server at http://0.0.0.0:%d", port)
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # One worker unless asked for more: with in-memory rate limiting, N workers
+    # would allow N times the configured requests per IP
+    workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+    logging.info("Starting API server at http://0.0.0.0:%d (%d workers)", port, workers)
+    # "auto" resolves to uvloop + httptools when installed (uvicorn[standard]),
+    # falling back to asyncio + h11 on platforms without them (e.g. Windows)
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=port,
+        loop="auto",
+        http="auto",
+        workers=workers,
+    )
@@ -0,0 +1,159 @@
+"""
+Semantic Cache — In-process LRU cache for retrieval results.
+
+Two tiers: an exact tier keyed by the normalized query text, and a semantic
+tier that matches a new query embedding against every cached query embedding.
+Cached embeddings are stored as int8 codes with one float32 scale per row,
+a quarter of the memory (and memory traffic per lookup) of float32 rows.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:  # optional: pip install cssm[fast]
+    njit = None
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase and collapse whitespace so trivially different queries share a key."""
+    return " ".join(query.lower().split())
+
+
+def _query_key(query: str) -> bytes:
+    return hashlib.sha1(normalize_query(query).encode("utf-8")).digest()
+
+
+# Rows dequantized per step of a lookup; bounds the float32 temporary
+_SCORE_BLOCK = 256
+
+
+def quantize(vec: np.ndarray):
+    """Symmetric int8 quantization: returns (codes, scale) with vec ~= codes * scale."""
+    peak = float(np.abs(vec).max()) if vec.size else 0.0
+    scale = peak / 127.0 if peak else 1.0
+    codes = np.clip(np.rint(vec / scale), -127, 127).astype(np.int8)
+    return codes, np.float32(scale)
+
+
+def _best_match_numpy(codes: np.ndarray, scales: np.ndarray, query: np.ndarray):
+    """Return (row, score) of the highest approximate dot product against ``query``."""
+    best_row, best_score = -1, -np.inf
+    for start in range(0, codes.shape[0], _SCORE_BLOCK):
+        block = codes[start:start + _SCORE_BLOCK].astype(np.float32) @ query
+        block *= scales[start:start + _SCORE_BLOCK]
+        row = int(np.argmax(block))
+        if block[row] > best_score:
+            best_row, best_score = start + row, float(block[row])
+    return best_row, best_score
+
+
+if njit is not None:
+    # No cache=True: it writes next to the package, which is often read-only in
+    # deployed images. The kernel is compiled per process by warm_kernels() instead.
+    @njit(parallel=True, fastmath=True)
+    def _best_match_numba(codes, scales, query):
+        """Numba kernel for _best_match_numpy: rows scored in parallel, no float32 copy of codes."""
+        n, dim = codes.shape
+        scores = np.empty(n, dtype=np.float32)
+        for i in prange(n):
+            acc = np.float32(0.0)
+            for j in range(dim):
+                acc += np.float32(codes[i, j]) * query[j]
+            scores[i] = acc * scales[i]
+        row = np.argmax(scores)
+        return row, scores[row]
+
+    def _best_match(codes, scales, query):
+        row, score = _best_match_numba(codes, scales, query)
+        return int(row), float(score)
+else:
+    _best_match = _best_match_numpy
+
+
+def warm_kernels() -> None:
+    """Compile the lookup kernel ahead of time (JIT takes ~1-2 s with numba).
+
+    Call from startup code off the event loop; a no-op without numba.
+    """
+    _best_match(np.zeros((1, 4), dtype=np.int8), np.ones(1, dtype=np.float32),
+                np.zeros(4, dtype=np.float32))
+
+
+class SemanticCache:
+    """LRU cache of retrieval results with exact and embedding-similarity lookup.
+
+    Cached query embeddings are unit-normalized, then stored as int8 rows of a
+    preallocated code matrix with a per-row scale. A lookup scores the float32
+    query against every row. Evicted rows get a zero scale and can never score
+    above the threshold.
+    """
+
+    def __init__(self, max_entries: int = 1024, threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._payloads: "OrderedDict[bytes, Any]" = OrderedDict()
+        self._rows: Dict[bytes, int] = {}
+        self._row_keys: List[Optional[bytes]] = [None] * max_entries
+        self._free_rows = list(range(max_entries - 1, -1, -1))
+        self._codes: Optional[np.ndarray] = None
+        self._scales = np.zeros(max_entries, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self._payloads)
+
+    @staticmethod
+    def _unit(embedding: Sequence[float]) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def get_exact(self, query: str) -> Optional[Any]:
+        """Return the cached payload for this exact (normalized) query, if any."""
+        key = _query_key(query)
+        with self._lock:
+            payload = self._payloads.get(key)
+            if payload is not None:
+                self._payloads.move_to_end(key)
+            return payload
+
+    def get_similar(self, embedding: Sequence[float]) -> Optional[Any]:
+        """Return the payload of the most similar cached query at or above the threshold."""
+        with self._lock:
+            if self._codes is None or not self._payloads:
+                return None
+            row, score = _best_match(self._codes, self._scales, self._unit(embedding))
+            if score < self.threshold:
+                return None
+            key = self._row_keys[row]
+            self._payloads.move_to_end(key)
+            return self._payloads[key]
+
+    def put(self, query: str, embedding: Sequence[float], payload: Any) -> None:
+        """Cache ``payload`` under the query text and its embedding, evicting the LRU entry."""
+        key = _query_key(query)
+        vec = self._unit(embedding)
+        with self._lock:
+            if self._codes is None:
+                self._codes = np.zeros((self.max_entries, vec.shape[0]), dtype=np.int8)
+
+            row = self._rows.get(key)
+            if row is None:
+                if not self._free_rows:
+                    evicted, _ = self._payloads.popitem(last=False)
+                    evicted_row = self._rows.pop(evicted)
+                    self._row_keys[evicted_row] = None
+                    self._scales[evicted_row] = 0.0
+                    self._free_rows.append(evicted_row)
+                row = self._free_rows.pop()
+                self._rows[key] = row
+                self._row_keys[row] = key
+
+            self._codes[row], self._scales[row] = quantize(vec)
+            self._payloads[key] = payload
+            self._payloads.move_to_end(key)
@@ -1,59 +1,174 @@
-import os
+import asyncio
 import logging
+import sqlite3
+import threading
+from typing import Dict, List, Optional
 
-from dotenv import load_dotenv
 from langchain_core.documents import Document
 from openai import OpenAI
-from supabase import create_client
+from supabase import ClientOptions, create_client
 
 from config.config_loader import load_config
+from retriever.cache import SemanticCache, normalize_query, warm_kernels
+from utils.embed_cache import DEFAULT_MAX_ENTRIES, EmbeddingCache
+from utils.env import get_env
+from utils.http import get_http_client
 
-load_dotenv(override=True)
+__all__ = ["Retriever"]
+
+logger = logging.getLogger(__name__)
+
+_REQUIRED_ENV = ("SUPABASE_URL", "SUPABASE_SERVICE_ROLE_KEY", "OPENAI_API_KEY")
+
+# OpenAI caps the number of inputs per embeddings request
+_EMBED_BATCH_LIMIT = 2048
+
+_INSTANCE = None
+_INSTANCE_LOCK = threading.Lock()
 
 
 class Retriever:
+    @classmethod
+    def get(cls) -> "Retriever":
+        """Return the process-wide Retriever, building it on first use."""
+        global _INSTANCE
+        if _INSTANCE is None:
+            with _INSTANCE_LOCK:
+                if _INSTANCE is None:
+                    _INSTANCE = cls()
+        return _INSTANCE
+
     def __init__(self):
+        self._load_env_variables()
         self.config = load_config()
         self._client = None
+        self._rest = None
         self._openai = None
+        # All config reads happen here, once; the request path only touches attributes
+        supabase_cfg = self.config["supabase"]
+        retriever_cfg = self.config.get("retriever", {})
+        self.embed_provider = self.config["embedding_model"]["provider"]
         self.embed_model = self.config["embedding_model"]["model"]
-        self.table = self.config["supabase"]["table_name"]
-        self.query_name = self.config["supabase"]["query_name"]
-        self.top_k = self.config["retriever"].get("top_k", 8)
+        self.table = supabase_cfg["table_name"]
+        self.query_name = supabase_cfg["query_name"]
+        self.top_k = retriever_cfg.get("top_k", 8)
 
         # Hybrid search settings
-        retriever_cfg = self.config.get("retriever", {})
         self.hybrid_enabled = retriever_cfg.get("hybrid", False)
         self.semantic_weight = retriever_cfg.get("semantic_weight", 0.7)
-        self.hybrid_rpc = self.config["supabase"].get("hybrid_query_name", "hybrid_search")
+        self.hybrid_rpc = supabase_cfg.get("hybrid_query_name", "hybrid_search")
+
+        # Semantic cache: exact normalized-query hits skip embedding + search,
+        # near-duplicate queries (cosine >= threshold) skip the search
+        cache_cfg = retriever_cfg.get("cache", {})
+        self._cache = (
+            SemanticCache(
+                max_entries=cache_cfg.get("max_entries", 1024),
+                threshold=cache_cfg.get("similarity_threshold", 0.95),
+            )
+            if cache_cfg.get("enabled", True)
+            else None
+        )
+
+        # Persistent embedding cache: repeated query text skips the embedding API
+        # even after a restart. Disabled (with a warning) if the file can't be opened.
+        self._embed_cache = None
+        embed_cache_cfg = retriever_cfg.get("embed_cache", {})
+        if embed_cache_cfg.get("enabled", True):
+            try:
+                self._embed_cache = EmbeddingCache(
+                    embed_cache_cfg.get("path"),
+                    max_entries=embed_cache_cfg.get("max_entries", DEFAULT_MAX_ENTRIES),
+                )
+            except (sqlite3.Error, OSError) as e:
+                logger.warning("Embedding cache disabled: %s", e)
+
+    def _load_env_variables(self) -> None:
+        env = get_env()
+        missing = set(_REQUIRED_ENV).difference(env)
+        if missing:
+            raise ValueError(f"Missing env vars: {sorted(missing)}. Set them in .env")
+        self._env = {k: env[k] for k in _REQUIRED_ENV}
 
     @property
     def client(self):
         if self._client is None:
+            # Share the process-wide HTTP/2 pool so concurrent RPCs (retrieve_batch)
+            # multiplex over kept-alive connections instead of opening their own
             self._client = create_client(
-                os.environ["SUPABASE_URL"],
-                os.environ["SUPABASE_SERVICE_ROLE_KEY"],
+                self._env["SUPABASE_URL"],
+                self._env["SUPABASE_SERVICE_ROLE_KEY"],
+                options=ClientOptions(httpx_client=get_http_client()),
             )
-            logging.info("Connected to Supabase")
+            logger.info("Connected to Supabase")
         return self._client
 
+    @property
+    def rest(self):
+        """The client's PostgREST handle, cached so RPCs skip the Supabase wrapper."""
+        if self._rest is None:
+            self._rest = self.client.postgrest
+        return self._rest
+
     @property
     def openai(self):
         if self._openai is None:
-            self._openai = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
+            self._openai = OpenAI(
+                api_key=self._env["OPENAI_API_KEY"],
+                http_client=get_http_client(),
+            )
         return self._openai
 
+    def warmup(self) -> None:
+        """Open the Supabase and OpenAI clients, make one embedding call and
+        compile the semantic-cache kernel.
+
+        Moves connection setup, TLS handshakes and JIT compilation off the
+        first user request.
+        """
+        _ = self.rest  # builds the Supabase client and its PostgREST handle
+        self._request_embeddings(["warmup"])  # bypasses the embedding cache on purpose
+        if self._cache is not None:
+            warm_kernels()
+        logger.info("Retriever warmed up")
+
     def _embed_query(self, query: str) -> list:
-        """Embed a query using OpenAI."""
-        resp = self.openai.embeddings.create(model=self.embed_model, input=query)
-        return resp.data[0].embedding
+        """Embed a query, consulting the on-disk embedding cache first."""
+        return self._embed_queries([query])[0]
 
-    def retrieve(self, query: str):
-        """Retrieve documents via hybrid (vector + keyword) or vector-only search."""
-        embedding = self._embed_query(query)
+    def _embed_queries(self, queries: List[str]) -> List[list]:
+        """Embed several queries, calling OpenAI only for those not on disk."""
+        if self._embed_cache is None:
+            return self._request_embeddings(queries)
+        try:
+            return self._embed_cache.get_or_embed(
+                self.embed_provider, self.embed_model, queries, self._request_embeddings
+            )
+        except sqlite3.Error as e:
+            # The cache is an optimization; a locked/corrupt file must not fail the query.
+            # Writes inside get_or_embed are already best-effort, so this is a failed read.
+            logger.warning("Embedding cache read failed, embedding directly: %s", e)
+            return self._request_embeddings(queries)
 
-        if self.hybrid_enabled:
-            result = self.client.rpc(
+    def _request_embeddings(self, queries: List[str]) -> List[list]:
+        """Embed via OpenAI, one call per _EMBED_BATCH_LIMIT inputs."""
+        embeddings = []
+        for start in range(0, len(queries), _EMBED_BATCH_LIMIT):
+            resp = self.openai.embeddings.create(
+                model=self.embed_model,
+                input=queries[start:start + _EMBED_BATCH_LIMIT],
+            )
+            embeddings.extend(item.embedding for item in sorted(resp.data, key=lambda d: d.index))
+        return embeddings
+
+    def _search(self, query: Optional[str], embedding: list):
+        """Run the hybrid or vector-only RPC for one query and wrap rows as Documents.
+
+        Hybrid search needs the query text, so a vector-only call falls back to
+        the plain vector RPC.
+        """
+        if self.hybrid_enabled and query is not None:
+            rows = self.rest.rpc(
                 self.hybrid_rpc,
                 {
                     "query_text": query,
@@ -62,20 +177,13 @@ class Retriever:
                     "semantic_weight": self.semantic_weight,
                     "filter": {},
                 },
-            ).execute()
-            logging.info(f"[hybrid] weight={self.semantic_weight} | query: {query[:80]}")
+            ).execute().data or []
+            logger.info("[hybrid] weight=%s | query: %.80s", self.semantic_weight, query)
         else:
-            result = self.client.rpc(
-                self.query_name,
-                {
-                    "query_embedding": embedding,
-                    "match_count": self.top_k,
-                    "filter": {},
-                },
-            ).execute()
+            rows = self.raw_query(embedding)
 
         docs_with_scores = []
-        for row in result.data or []:
+        for row in rows:
             doc = Document(
                 page_content=row["content"],
                 metadata=row.get("metadata", {}),
@@ -83,19 +191,148 @@ class Retriever:
             score = row.get("similarity", 0.0)
             docs_with_scores.append((doc, score))
 
-        logging.info(f"Retrieved {len(docs_with_scores)} docs for: {query[:80]}")
+        logger.info("Retrieved %d docs for: %.80s", len(docs_with_scores), query)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Output: %s", docs_with_scores)
+        if self._cache is not None and query is not None:
+            self._cache.put(query, embedding, tuple(docs_with_scores))
         return docs_with_scores
 
+    def _cached(self, query: str, embedding: list = None):
+        """Return cached results for the query (exact tier, or semantic tier if an embedding is given)."""
+        if self._cache is None:
+            return None
+        if embedding is None:
+            cached = self._cache.get_exact(query)
+            tier = "exact"
+        else:
+            cached = self._cache.get_similar(embedding)
+            tier = "semantic"
+        if cached is None:
+            return None
+        logger.info("[cache] %s hit | query: %.80s", tier, query)
+        return list(cached)
+
+    def raw_query(self, embedding: list, k: Optional[int] = None) -> List[dict]:
+        """Vector-only search returning the raw RPC rows (content, metadata, similarity).
+
+        No Document wrapping and no caching, for callers that post-process rows themselves.
+        """
+        result = self.rest.rpc(
+            self.query_name,
+            {
+                "query_embedding": embedding,
+                "match_count": k or self.top_k,
+                "filter": {},
+            },
+        ).execute()
+        return result.data or []
+
+    def retrieve(self, query: Optional[str] = None, embedding: Optional[list] = None):
+        """Retrieve documents via hybrid (vector + keyword) or vector-only search.
+
+        Pass ``embedding`` when the query vector is already known to skip the
+        embedding call. Without ``query`` text the search is vector-only.
+        """
+        if query is None and embedding is None:
+            raise ValueError("retrieve() needs a query, an embedding, or both")
+        if embedding is None:
+            cached = self._cached(query)
+            if cached is not None:
+                return cached
+            embedding = self._embed_query(query)
+
+        cached = self._cached(query, embedding)
+        if cached is not None:
+            return cached
+
+        return self._search(query, embedding)
+
+    async def aretrieve(self, query: Optional[str] = None, embedding: Optional[list] = None):
+        """Async retrieve: the embedding call and the RPC run in worker threads."""
+        if query is None and embedding is None:
+            raise ValueError("aretrieve() needs a query, an embedding, or both")
+        if embedding is None:
+            cached = self._cached(query)
+            if cached is not None:
+                return cached
+            embedding = await asyncio.to_thread(self._embed_query, query)
+
+        cached = self._cached(query, embedding)
+        if cached is not None:
+            return cached
+
+        return await asyncio.to_thread(self._search, query, embedding)
+
+    async def aretrieve_batch(self, queries: List[str]):
+        """Retrieve for many queries: batched embedding calls, then concurrent RPCs.
+
+        Queries that normalize to the same text are embedded and searched once.
+        The embedding round trip is shared by up to _EMBED_BATCH_LIMIT queries.
+        Returns one list of (Document, score) per query, in input order.
+        """
+        results = [None] * len(queries)
+        pending: Dict[str, List[int]] = {}
+        for i, query in enumerate(queries):
+            cached = self._cached(query)
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.setdefault(normalize_query(query), []).append(i)
+        if not pending:
+            return results
+
+        groups = list(pending.values())
+        unique = [queries[indices[0]] for indices in groups]
+        embeddings = await asyncio.to_thread(self._embed_queries, unique)
+
+        searches = []
+        for query, indices, embedding in zip(unique, groups, embeddings):
+            cached = self._cached(query, embedding)
+            if cached is not None:
+                for i in indices:
+                    results[i] = list(cached)
+            else:
+                searches.append((query, indices, embedding))
+
+        found = await asyncio.gather(
+            *(asyncio.to_thread(self._search, query, emb) for query, _, emb in searches)
+        )
+        for (_, indices, _), docs_with_scores in zip(searches, found):
+            for i in indices:
+                results[i] = list(docs_with_scores)
+
+        logger.info(
+            "[batch] %d queries | %d embedded | %d searched",
+            len(queries), len(unique), len(searches),
+        )
+        return results
+
+    def retrieve_batch(self, queries: List[str]):
+        """Synchronous wrapper around aretrieve_batch (not for use inside a running loop)."""
+        return asyncio.run(self.aretrieve_batch(queries))
+
 
 if __name__ == "__main__":
     logging.basicConfig(
         level=logging.INFO,
-        format="%(asctime)s | %(levelname)s | %(message)s",
+        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
     )
-    retriever = Retriever()
-    query = "Can you suggest good budget laptops?"
-    results = retriever.retrieve(query)
-    for idx, (doc, score) in enumerate(results, start=1):
-        logging.info(f"[{idx}] sim={score:.3f} | {doc.page_content[:120]}")
-        logging.info(f"     metadata={doc.metadata}")
-        logging.info("-" * 80)
+    retriever = Retriever.get()
+    retriever.warmup()
+
+    # Single query from async code (e.g. a FastAPI handler): await retriever.aretrieve(q)
+    results = asyncio.run(retriever.aretrieve("Can you suggest good budget laptops?"))
+    logger.info("aretrieve returned %d docs", len(results))
+
+    queries = [
+        "Can you suggest good budget laptops?",
+        "Which wireless earbuds have the best battery life?",
+    ]
+    # One embedding call + concurrent searches instead of looping over retrieve()
+    for query, results in zip(queries, retriever.retrieve_batch(queries)):
+        logger.info("Query: %s", query)
+        for idx, (doc, score) in enumerate(results, start=1):
+            logger.info("[%d] sim=%.3f | %.120s", idx, score, doc.page_content)
+            logger.info("     metadata=%s", doc.metadata)
+        logger.info("-" * 80)
@@ -16,13 +16,13 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(
 
 p = DataIngestion()
 reviews = p.load_and_deduplicate()
-chunks = p.transform(reviews)
+chunk_count = sum(1 for _ in p.iter_chunks(reviews))
 
-est_storage_mb = len(chunks) * 7 / 1024
-est_cost = len(chunks) * 100 * 0.02 / 1_000_000
+est_storage_mb = chunk_count * 7 / 1024
+est_cost = chunk_count * 100 * 0.02 / 1_000_000
 
 print(f"\n{'='*40}")
-print(f"Chunks:        {len(chunks):,}")
+print(f"Chunks:        {chunk_count:,}")
 print(f"Est. storage:  {est_storage_mb:.0f} MB")
 print(f"Est. cost:     ${est_cost:.2f}")
 print(f"{'='*40}")
@@ -13,7 +13,7 @@ from retriever.retrieval import Retriever
 from utils.model_loader import ModelLoader
 
 # Build the graph
-retriever = Retriever()
+retriever = Retriever.get()
 model_loader = ModelLoader()
 graph = build_graph(retriever, model_loader, max_retries=2)
 
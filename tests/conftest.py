@@ -1,6 +1,6 @@
 """Shared fixtures for CSSM API tests."""
 import os
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from fastapi.testclient import TestClient
@@ -16,7 +16,7 @@ def _clear_api_key(monkeypatch):
 def mock_rag_graph():
     """Create a mock RAG graph that returns a canned response."""
     graph = MagicMock()
-    graph.invoke.return_value = {
+    graph.ainvoke = AsyncMock(return_value={
         "answer": "The XPS 15 is highly rated for students [1].",
         "sources": [
             {
@@ -25,7 +25,7 @@ def mock_rag_graph():
                 "similarity": 0.87,
             }
         ],
-    }
+    })
     return graph
 
 
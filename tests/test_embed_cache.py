@@ -0,0 +1,69 @@
+"""Tests for the persistent SQLite embedding cache."""
+import sqlite3
+
+from utils.embed_cache import EmbeddingCache
+
+
+def _counting_embedder(calls):
+    def embed(texts):
+        calls.append(list(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+    return embed
+
+
+def test_only_misses_are_embedded(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embed.sqlite3"))
+    calls = []
+    embed = _counting_embedder(calls)
+
+    first = cache.get_or_embed("openai", "m", ["ab", "abc"], embed)
+    second = cache.get_or_embed("openai", "m", ["abc", "abcd", "ab"], embed)
+
+    assert first == [[2.0, 1.0], [3.0, 1.0]]
+    assert second == [[3.0, 1.0], [4.0, 1.0], [2.0, 1.0]]
+    assert calls == [["ab", "abc"], ["abcd"]]
+
+
+def test_survives_reopen(tmp_path):
+    path = str(tmp_path / "embed.sqlite3")
+    EmbeddingCache(path).put_many("openai", "m", ["hello"], [[0.5, -0.25]])
+    assert EmbeddingCache(path).get_many("openai", "m", ["hello"]) == [[0.5, -0.25]]
+
+
+def test_key_includes_model(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embed.sqlite3"))
+    cache.put_many("openai", "small", ["hello"], [[1.0]])
+    assert cache.get_many("openai", "large", ["hello"]) == [None]
+
+
+def test_evicts_least_recently_used_beyond_cap(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embed.sqlite3"), max_entries=2)
+    cache.put_many("openai", "m", ["a"], [[1.0]])
+    cache.put_many("openai", "m", ["b"], [[2.0]])
+    cache.get_many("openai", "m", ["a"])  # "b" becomes least recently used
+    cache.put_many("openai", "m", ["c"], [[3.0]])
+    assert len(cache) == 2
+    assert cache.get_many("openai", "m", ["a", "b", "c"]) == [[1.0], None, [3.0]]
+
+
+def test_file_is_owner_only(tmp_path):
+    path = tmp_path / "sub" / "embed.sqlite3"
+    EmbeddingCache(str(path))
+    assert path.stat().st_mode & 0o777 == 0o600
+
+
+def test_locked_database_does_not_fail_reads_or_writes(tmp_path):
+    path = str(tmp_path / "embed.sqlite3")
+    cache = EmbeddingCache(path)
+    cache.put_many("openai", "m", ["hit"], [[1.0]])
+
+    other = sqlite3.connect(path)
+    other.execute("BEGIN IMMEDIATE")  # another worker holds the write lock
+    try:
+        calls = []
+        vectors = cache.get_or_embed("openai", "m", ["hit", "miss"], _counting_embedder(calls))
+        assert vectors == [[1.0], [4.0, 1.0]]
+        assert calls == [["miss"]]
+    finally:
+        other.rollback()
+        other.close()
@@ -0,0 +1,54 @@
+"""Parity between the Python and DuckDB review/metadata merge engines."""
+import json
+
+import pytest
+
+from data.data import merge_reviews_with_metadata, merge_reviews_with_metadata_duckdb
+
+METADATA = [
+    {"parent_asin": "P1", "asin": "A1", "title": "Laptop", "description": ["Fast", "light"],
+     "average_rating": 4.5, "rating_number": 10, "main_category": "Computers", "store": "Dell",
+     "price": 999.0},
+    {"parent_asin": "P2", "asin": "A2", "title": None, "description": None,
+     "average_rating": None, "rating_number": None, "main_category": None, "store": None,
+     "price": "None"},
+    {"parent_asin": None, "asin": "P3", "title": "Cable", "description": "USB-C",
+     "average_rating": 3.0, "rating_number": 2, "main_category": "Accessories", "store": None,
+     "price": None},
+]
+
+REVIEWS = [
+    {"asin": "P1", "user_id": "u1", "title": "Great", "text": "Works well", "rating": 5.0,
+     "verified_purchase": True, "helpful_vote": 3, "timestamp": 1},
+    {"asin": "P2", "user_id": None, "title": None, "text": "Fine", "rating": None,
+     "verified_purchase": None, "helpful_vote": None, "timestamp": None},
+    {"asin": "P3", "user_id": "u3", "title": "Ok", "text": None, "rating": 3.0,
+     "verified_purchase": False, "helpful_vote": 0, "timestamp": 3},
+    {"asin": "P3", "user_id": "u4", "title": None, "text": "  ", "rating": 1.0,
+     "verified_purchase": False, "helpful_vote": 0, "timestamp": 4},
+    {"asin": "MISSING", "user_id": "u5", "title": "x", "text": "y", "rating": 2.0,
+     "verified_purchase": False, "helpful_vote": 0, "timestamp": 5},
+]
+
+
+def _write_jsonl(path, rows):
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+    return path
+
+
+def _read_jsonl(path):
+    rows = [json.loads(line) for line in path.read_text().splitlines() if line.strip()]
+    return sorted(rows, key=lambda row: (row["product_id"], row["timestamp"] or 0))
+
+
+def test_duckdb_merge_matches_python_merge_with_null_fields(tmp_path):
+    pytest.importorskip("duckdb")
+    reviews = _write_jsonl(tmp_path / "reviews.jsonl", REVIEWS)
+    metadata = _write_jsonl(tmp_path / "meta.jsonl", METADATA)
+
+    python_out = tmp_path / "python.jsonl"
+    duckdb_out = tmp_path / "duckdb.jsonl"
+    assert merge_reviews_with_metadata(reviews, metadata, None, python_out) == 3
+    assert merge_reviews_with_metadata_duckdb(reviews, metadata, None, duckdb_out) == 3
+
+    assert _read_jsonl(duckdb_out) == _read_jsonl(python_out)
@@ -0,0 +1,55 @@
+"""Tests for the in-process semantic retrieval cache."""
+import numpy as np
+import pytest
+
+from retriever import cache as cache_mod
+from retriever.cache import SemanticCache
+
+
+def test_exact_hit_ignores_case_and_whitespace():
+    cache = SemanticCache(max_entries=4)
+    cache.put("Best  budget laptop", [1.0, 0.0], ["doc"])
+    assert cache.get_exact("  best budget LAPTOP ") == ["doc"]
+
+
+def test_similar_hit_above_threshold():
+    cache = SemanticCache(max_entries=4, threshold=0.95)
+    cache.put("budget laptop", [1.0, 0.0], ["doc"])
+    assert cache.get_similar([0.99, 0.05]) == ["doc"]
+
+
+def test_similar_miss_below_threshold():
+    cache = SemanticCache(max_entries=4, threshold=0.95)
+    cache.put("budget laptop", [1.0, 0.0], ["doc"])
+    assert cache.get_similar([0.0, 1.0]) is None
+
+
+def test_lru_eviction():
+    cache = SemanticCache(max_entries=2)
+    cache.put("a", [1.0, 0.0], "A")
+    cache.put("b", [0.0, 1.0], "B")
+    cache.get_exact("a")  # touch "a" so "b" becomes least recently used
+    cache.put("c", [0.7, 0.7], "C")
+    assert len(cache) == 2
+    assert cache.get_exact("b") is None
+    assert cache.get_similar([0.0, 1.0]) is None
+    assert cache.get_exact("a") == "A"
+
+
+def test_quantized_scores_stay_close_to_cosine():
+    cache = SemanticCache(max_entries=4, threshold=0.999)
+    vec = [0.3, -0.5, 0.8, 0.1]
+    cache.put("q", vec, "Q")
+    assert cache.get_similar(vec) == "Q"
+
+
+@pytest.mark.skipif(cache_mod.njit is None, reason="numba not installed")
+def test_numba_kernel_matches_numpy():
+    rng = np.random.default_rng(0)
+    codes = rng.integers(-127, 128, size=(300, 64), dtype=np.int8)
+    scales = rng.random(300, dtype=np.float32)
+    query = rng.standard_normal(64).astype(np.float32)
+    row, score = cache_mod._best_match(codes, scales, query)
+    ref_row, ref_score = cache_mod._best_match_numpy(codes, scales, query)
+    assert row == ref_row
+    assert abs(score - ref_score) < 1e-3 * abs(ref_score)
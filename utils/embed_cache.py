@@ -0,0 +1,150 @@
+"""
+Embedding Cache — SQLite-backed, survives process restarts.
+
+Vectors are stored as float32 blobs keyed by sha256(provider|model|text), so a
+cold process (new container, worker restart) skips the embedding API for text
+it has already embedded. The file is capped at ``max_entries`` rows; the least
+recently used rows are evicted first. All writes are best-effort: a locked
+database costs a skipped write, never a failed read.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# App-owned, per-user location (not the shared temp dir)
+DEFAULT_PATH = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "cssm",
+    "embed_cache.sqlite3",
+)
+DEFAULT_MAX_ENTRIES = 20_000  # ~6 KB per 1536-d vector -> ~120 MB
+_SELECT_BATCH = 500
+# Hit timestamps are buffered and written in batches, so a cache read never
+# needs the write lock that other workers sharing the file may be holding
+_TOUCH_BATCH = 256
+# Best-effort cache: wait briefly for another worker's write, then give up
+_BUSY_TIMEOUT = 0.5
+
+logger = logging.getLogger(__name__)
+
+
+def _key(provider: str, model: str, text: str) -> bytes:
+    return hashlib.sha256(f"{provider}|{model}|{text}".encode("utf-8")).digest()
+
+
+def _create_private(path: str) -> None:
+    """Create the cache file (and its directory) readable by the owner only."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    os.close(fd)
+    os.chmod(path, 0o600)
+
+
+class EmbeddingCache:
+    """Persistent text -> embedding cache shared by all threads (and processes) on a host."""
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path or DEFAULT_PATH
+        self.max_entries = max_entries
+        _create_private(self.path)
+        self._lock = threading.Lock()
+        self._touched: Dict[bytes, float] = {}
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=_BUSY_TIMEOUT)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(key BLOB PRIMARY KEY, vec BLOB NOT NULL, used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_used ON embeddings (used)")
+        self._conn.commit()
+        logger.info("Embedding cache: %s (max %d entries)", self.path, self.max_entries)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, provider: str, model: str, texts: Sequence[str]) -> List[Optional[list]]:
+        """Return the cached vector for each text, or None where it is missing."""
+        keys = [_key(provider, model, t) for t in texts]
+        found = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit (999 on older builds)
+            for start in range(0, len(keys), _SELECT_BATCH):
+                part = keys[start:start + _SELECT_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(part))})",
+                    part,
+                ).fetchall()
+                found.update((k, np.frombuffer(v, dtype=np.float32).tolist()) for k, v in rows)
+            now = time.time()
+            self._touched.update((k, now) for k in found)
+            if len(self._touched) >= _TOUCH_BATCH:
+                self._write(self._flush_touched)
+        return [found.get(k) for k in keys]
+
+    def _flush_touched(self) -> None:
+        self._conn.executemany(
+            "UPDATE embeddings SET used = ? WHERE key = ?",
+            [(used, k) for k, used in self._touched.items()],
+        )
+        self._touched.clear()
+
+    def _write(self, *steps: Callable[[], None]) -> bool:
+        """Run write steps in one transaction (caller holds the lock); log and skip on error."""
+        try:
+            for step in steps:
+                step()
+            self._conn.commit()
+            return True
+        except sqlite3.Error as e:
+            self._conn.rollback()
+            logger.warning("Embedding cache write skipped: %s", e)
+            return False
+
+    def put_many(self, provider: str, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        """Store vectors, then evict least recently used rows beyond ``max_entries``."""
+        now = time.time()
+        rows = [
+            (_key(provider, model, t), np.asarray(v, dtype=np.float32).tobytes(), now)
+            for t, v in zip(texts, vectors)
+        ]
+        def insert() -> None:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+
+        def evict() -> None:
+            excess = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY used LIMIT ?)",
+                    (excess,),
+                )
+
+        with self._lock:
+            # Pending hit timestamps ride along, so eviction sees recent use
+            self._write(self._flush_touched, insert, evict)
+
+    def get_or_embed(
+        self,
+        provider: str,
+        model: str,
+        texts: Sequence[str],
+        embed_fn: Callable[[List[str]], List[list]],
+    ) -> List[list]:
+        """Return embeddings for ``texts``, calling ``embed_fn`` only for cache misses."""
+        vectors = self.get_many(provider, model, texts)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            fresh = embed_fn([texts[i] for i in missing])
+            self.put_many(provider, model, [texts[i] for i in missing], fresh)
+            for i, vec in zip(missing, fresh):
+                vectors[i] = vec
+        return vectors
@@ -0,0 +1,19 @@
+"""
+Process-wide environment snapshot.
+
+`.env` is loaded once and the resulting environment is frozen, so modules that
+need credentials share one read instead of each calling load_dotenv().
+"""
+import os
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping
+
+from dotenv import load_dotenv
+
+
+@lru_cache(maxsize=1)
+def get_env() -> Mapping[str, str]:
+    """Load `.env` (overriding the shell) once and return a read-only environment."""
+    load_dotenv(override=True)
+    return MappingProxyType(dict(os.environ))
@@ -0,0 +1,24 @@
+"""
+Shared HTTP clients for provider SDKs.
+
+One keep-alive HTTP/2 pool per process means the TLS handshake to each
+provider is paid once instead of per client object.
+"""
+from functools import lru_cache
+
+import httpx
+
+_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=64)
+_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+
+
+@lru_cache(maxsize=1)
+def get_http_client() -> httpx.Client:
+    """Process-wide sync client (HTTP/2, pooled)."""
+    return httpx.Client(http2=True, limits=_LIMITS, timeout=_TIMEOUT)
+
+
+@lru_cache(maxsize=1)
+def get_async_http_client() -> httpx.AsyncClient:
+    """Process-wide async client (HTTP/2, pooled). Use from a single event loop."""
+    return httpx.AsyncClient(http2=True, limits=_LIMITS, timeout=_TIMEOUT)
@@ -1,10 +1,9 @@
-import os
 import logging
-from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from config.config_loader import load_config
+from utils.env import get_env
+from utils.http import get_async_http_client, get_http_client
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
 
 class ModelLoader:
@@ -13,61 +12,101 @@ class ModelLoader:
     def __init__(self):
         self.config = load_config()
         self._validate_env()
+        self._embeddings = None
+        self._llm = None
+
+        # Provider -> factory, resolved once; each SDK is imported on first use
+        self._embed_factories = {
+            "openai": self._openai_embeddings,
+            "google": self._google_embeddings,
+        }
+        self._llm_factories = {
+            "openai": self._openai_llm,
+            "groq": self._groq_llm,
+            "google": self._google_llm,
+            "anthropic": self._anthropic_llm,
+        }
 
     def _validate_env(self):
-        provider = self.config["llm_model"]["provider"]
         key_map = {
             "openai": "OPENAI_API_KEY",
             "groq": "GROQ_API_KEY",
             "google": "GOOGLE_API_KEY",
             "anthropic": "ANTHROPIC_API_KEY",
         }
-        required_key = key_map.get(provider)
-        if required_key and required_key not in os.environ:
-            raise ValueError(
-                f"Missing {required_key} for provider '{provider}'. Set it in .env"
-            )
-
-        embed_provider = self.config["embedding_model"]["provider"]
-        embed_key = key_map.get(embed_provider)
-        if embed_key and embed_key not in os.environ:
+        providers = {
+            self.config["llm_model"]["provider"],
+            self.config["embedding_model"]["provider"],
+        }
+        required = {key_map[p] for p in providers if p in key_map}
+        missing = required - get_env().keys()
+        if missing:
             raise ValueError(
-                f"Missing {embed_key} for embedding provider '{embed_provider}'. Set it in .env"
+                f"Missing {', '.join(sorted(missing))} for providers {sorted(providers)}. Set them in .env"
             )
 
     def load_embeddings(self):
-        provider = self.config["embedding_model"]["provider"]
-        model = self.config["embedding_model"]["model"]
-        logging.info(f"Loading embeddings: {provider}/{model}")
+        if self._embeddings is None:
+            provider = self.config["embedding_model"]["provider"]
+            model = self.config["embedding_model"]["model"]
+            factory = self._embed_factories.get(provider)
+            if factory is None:
+                raise ValueError(f"Unsupported embedding provider: {provider}")
+            logger.info("Loading embeddings: %s/%s", provider, model)
+            self._embeddings = factory(model)
+        return self._embeddings
 
-        if provider == "openai":
-            return OpenAIEmbeddings(model=model)
+    def load_llm(self):
+        if self._llm is None:
+            provider = self.config["llm_model"]["provider"]
+            model = self.config["llm_model"]["model"]
+            temperature = self.config["llm_model"].get("temperature", 0.2)
+            factory = self._llm_factories.get(provider)
+            if factory is None:
+                raise ValueError(f"Unsupported LLM provider: {provider}")
+            logger.info("Loading LLM: %s/%s (temp=%s)", provider, model, temperature)
+            self._llm = factory(model, temperature)
+        return self._llm
 
-        # Optional providers — import only if needed
-        if provider == "google":
-            from langchain_google_genai import GoogleGenerativeAIEmbeddings
-            return GoogleGenerativeAIEmbeddings(model=model)
+    # ── Embedding factories ──
 
-        raise ValueError(f"Unsupported embedding provider: {provider}")
+    @staticmethod
+    def _openai_embeddings(model):
+        from langchain_openai import OpenAIEmbeddings
+        return OpenAIEmbeddings(
+            model=model,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client(),
+        )
 
-    def load_llm(self):
-        provider = self.config["llm_model"]["provider"]
-        model = self.config["llm_model"]["model"]
-        temperature = self.config["llm_model"].get("temperature", 0.2)
-        logging.info(f"Loading LLM: {provider}/{model} (temp={temperature})")
-
-        if provider == "openai":
-            return ChatOpenAI(model=model, temperature=temperature)
-
-        # Optional providers — import only if needed
-        if provider == "groq":
-            from langchain_groq import ChatGroq
-            return ChatGroq(model=model, temperature=temperature)
-        if provider == "google":
-            from langchain_google_genai import ChatGoogleGenerativeAI
-            return ChatGoogleGenerativeAI(model=model, temperature=temperature)
-        if provider == "anthropic":
-            from langchain_anthropic import ChatAnthropic
-            return ChatAnthropic(model=model, temperature=temperature)
-
-        raise ValueError(f"Unsupported LLM provider: {provider}")
+    @staticmethod
+    def _google_embeddings(model):
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        return GoogleGenerativeAIEmbeddings(model=model)
+
+    # ── LLM factories ──
+
+    @staticmethod
+    def _openai_llm(model, temperature):
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(
+            model=model,
+            temperature=temperature,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client(),
+        )
+
+    @staticmethod
+    def _groq_llm(model, temperature):
+        from langchain_groq import ChatGroq
+        return ChatGroq(model=model, temperature=temperature)
+
+    @staticmethod
+    def _google_llm(model, temperature):
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        return ChatGoogleGenerativeAI(model=model, temperature=temperature)
+
+    @staticmethod
+    def _anthropic_llm(model, temperature):
+        from langchain_anthropic import ChatAnthropic
+        return ChatAnthropic(model=model, temperature=temperature)